@@ -3,22 +3,60 @@
 
 from __future__ import annotations
 import asyncio
-from typing import TypedDict, Optional, List, Dict, Any
+import string
+from collections import deque
+from typing import TypedDict, Optional, List, Dict, Any, AsyncIterator
 
-from langgraph.graph import StateGraph, END  # type: ignore
+from langgraph.graph import StateGraph, START, END  # type: ignore
 
 from core.llm_client import LLMClient  # type: ignore
+from core.shared_encoder import get_encoder  # type: ignore
 from memory.quote_db import QuoteDBManager  # type: ignore
 from memory.vector_db import VectorDBManager  # type: ignore
 from memory.short_term import ConversationBuffer  # type: ignore
 from agents.memory_gatekeeper import MemoryGatekeeper  # type: ignore
 
 
+# ──────────────────────────────────────────────────────────────
+# Blend prompt (pre-rendered once at import)
+# ──────────────────────────────────────────────────────────────
+# The instructions + few-shot examples are static, so we bake them into a
+# module-level Template instead of rebuilding a ~1.5 KB f-string per turn.
+# Only the per-turn slots (direct answer, quote, source, prefs) get substituted.
+BLEND_TEMPLATE = string.Template(
+    "You have a direct answer and a cinematic quote. "
+    "Blend them into a single, conversational text response. You MUST keep the vast majority of the quote's literal original words, but you are allowed to slightly tweak the grammar, tense, or pronouns to make it flow seamlessly into your sentence.\n\n"
+    "BLENDING STRATEGY:\n"
+    "1. Create ONE highly natural, short, and punchy response (1-2 sentences MAXIMUM).\n"
+    "2. Seamless integration: DO NOT use quotation marks. The quote should literally merge into your own sentence grammatically.\n"
+    "3. MATCH A HUMAN TONE: Never sound like an AI robot. Do NOT use corporate or therapy-speak like 'building resilience', 'foundation for growth', 'embrace it', or 'regardless of background'. Be direct, casual, and cinematic.\n"
+    "4. NEVER explain, interpret, or justify the quote! Just weave the core phrase directly into the conversation naturally.\n"
+    "5. AT THE VERY END OF YOUR RESPONSE, always append ($character - $source). Do NOT embed the source inside the sentence.\n\n"
+    "EXAMPLES OF MASTERFUL, SHORT BLENDING:\n\n"
+    "Direct: You need to stand up for yourself because no one else will.\n"
+    "Quote: I am the one who knocks!\n"
+    "✅ GOOD (Start): You have to be the one who knocks, so adopt that mindset and stand up for yourself, because no one else will. (Walter White - Breaking Bad)\n\n"
+    "Direct: It's okay to fail as long as you keep trying.\n"
+    "Quote: There is no shame in being weak. The shame is in staying weak.\n"
+    "✅ GOOD (Middle): It's okay to fail because there's no shame in being weak, but the real shame is just staying weak and giving up. (Sung Jin-Woo - Solo Leveling)\n\n"
+    "Direct: Don't give up on your dreams, it takes time.\n"
+    "Quote: Even if you are not ready for the day, it cannot always be night.\n"
+    "✅ GOOD (End): It takes time to achieve your dreams, so don't give up entirely; even if you aren't ready for the day, it can't always be night. (Gwendolyn - Spider-Verse)\n\n"
+    "$prefs\n\n"
+    "NOW BLEND:\n"
+    "Direct answer: $direct\n"
+    "Base Quote: $quote\n"
+    "Source Info (to put at the VERY end): ($character - $source)\n\n"
+    "Your perfectly seamless, natural response:"
+)
+
+
 # ──────────────────────────────────────────────────────────────
 # Typed State
 # ──────────────────────────────────────────────────────────────
 class GraphState(TypedDict):
     user_query:      str
+    query_vec:       Optional[Any]               # shared (1, d) query embedding
     preferences:     List[Dict[str, Any]]
     chat_history:    List[Dict[str, str]]
     direct_answer:   str                        # LLM's direct answer
@@ -49,8 +87,21 @@ class CinematicPipeline:
         self.chat_buffer = chat_buffer
         self.gatekeeper  = gatekeeper
 
-        # Track used quotes to avoid repetition
-        self._used_indices: list[int] = []
+        # Track used quotes to avoid repetition (ring buffer of the last 5)
+        self._used_indices: deque[int] = deque(maxlen=5)
+
+        # Per-run queue the blend node pushes final-response chunks into,
+        # so callers of run_stream() see tokens as they decode. The active
+        # graph task is tracked so an abandoned run can be cancelled before
+        # the next one starts.
+        self._chunk_queue: Optional[asyncio.Queue] = None
+        self._graph_task: Optional[asyncio.Task] = None
+
+        # Strong refs to fire-and-forget gatekeeper tasks — asyncio only keeps
+        # weak references, so an unreferenced task can be GC'd mid-flight and
+        # silently drop the memory write. Semaphore bounds background LLM calls.
+        self._bg_tasks: set[asyncio.Task] = set()
+        self._gatekeeper_sem = asyncio.Semaphore(2)
 
         self._graph = self._build_graph()
 
@@ -59,28 +110,54 @@ class CinematicPipeline:
     def _build_graph(self) -> Any:
         g = StateGraph(GraphState)
 
+        g.add_node("encode_query",    self._node_encode_query)
         g.add_node("load_context",    self._node_load_context)
         g.add_node("generate_answer", self._node_generate_answer)
         g.add_node("retrieve_quote",  self._node_retrieve_quote)
         g.add_node("blend_answer",    self._node_blend_answer)
 
-        g.set_entry_point("load_context")
-        
-        # Optimize: Route to both in parallel to hide RAG search latency
+        # Encode the query exactly once, then fan out: retrieve_quote only
+        # needs user_query + its vector, so it runs concurrently with
+        # load_context instead of waiting behind it
+        g.add_edge(START, "encode_query")
+        g.add_edge("encode_query", "load_context")
+        g.add_edge("encode_query", "retrieve_quote")
+
+        # generate_answer needs the preferences loaded by load_context
         g.add_edge("load_context", "generate_answer")
-        g.add_edge("load_context", "retrieve_quote")
-        
-        # Converge
-        g.add_edge("generate_answer", "blend_answer")
-        g.add_edge("retrieve_quote", "blend_answer")
-        
+
+        # Converge on a real join barrier: the list form makes blend_answer
+        # wait for BOTH branches (they're unequal length — retrieve_quote
+        # finishes a superstep before generate_answer, and two separate
+        # add_edge calls would fire blend once per arriving branch)
+        g.add_edge(["generate_answer", "retrieve_quote"], "blend_answer")
+
         g.add_edge("blend_answer", END)
 
         return g.compile()
 
+    # ── Node 0: encode_query ──────────────────────────────────
+
+    async def _node_encode_query(self, state: GraphState) -> Dict[str, Any]:
+        """
+        One MiniLM forward per turn: every downstream FAISS search reuses
+        this vector instead of re-encoding the same query string.
+        """
+        def _encode():
+            return get_encoder().encode(
+                [state["user_query"]],
+                convert_to_numpy=True,
+                normalize_embeddings=True,
+                batch_size=1,
+                show_progress_bar=False,
+            ).astype("float32")
+
+        query_vec = await asyncio.to_thread(_encode)
+        return {"query_vec": query_vec}
+
     # ── Node 1: load_context ──────────────────────────────────
 
-    async def _node_load_context(self, state: GraphState) -> GraphState:
+    async def _node_load_context(self, state: GraphState) -> Dict[str, Any]:
         """
         Parallel FAISS ops (both sync, run in threads):
           • Decay-RAG  →  long-term preferences
@@ -89,10 +166,12 @@ class CinematicPipeline:
         # Query both preferences and custom facts (personal_context)
         prefs, facts, history = await asyncio.gather(
             asyncio.to_thread(
-                self.vector_db.search_with_decay, "preferences", state["user_query"], 2
+                self.vector_db.search,
+                "preferences", state["user_query"], 2, state["query_vec"],
             ),
             asyncio.to_thread(
-                self.vector_db.search_with_decay, "personal_context", state["user_query"], 2
+                self.vector_db.search,
+                "personal_context", state["user_query"], 2, state["query_vec"],
             ),
             asyncio.to_thread(self.chat_buffer.get_history),
         )
@@ -101,11 +180,11 @@ class CinematicPipeline:
         if all_memory:
             print(f"\033[93m[Retrieved Memory]: '{all_memory[0]['text'][:50]}...'\033[0m")
 
-        return {**state, "preferences": all_memory, "chat_history": history}
+        return {"preferences": all_memory, "chat_history": history}
 
     # ── Node 2: generate_answer ───────────────────────────────
 
-    async def _node_generate_answer(self, state: GraphState) -> GraphState:
+    async def _node_generate_answer(self, state: GraphState) -> Dict[str, Any]:
         """
         LLM generates a short, direct answer to the user's question.
         This is ALWAYS relevant because it's directly responding to the query.
@@ -127,15 +206,16 @@ class CinematicPipeline:
 
         print("\n💬 [LLM] Generating direct answer...")
         answer = ""
-        async for chunk in self.llm.generate_stream(messages, temperature=0.6):
+        # 1-2 short sentences — cap decode length accordingly
+        async for chunk in self.llm.generate_stream(messages, temperature=0.6, num_predict=80):
             answer += chunk
 
         print(f"\033[92m  Direct answer: {answer}\033[0m")
-        return {**state, "direct_answer": answer}
+        return {"direct_answer": answer}
 
     # ── Node 3: retrieve_quote ────────────────────────────────
 
-    async def _node_retrieve_quote(self, state: GraphState) -> GraphState:
+    async def _node_retrieve_quote(self, state: GraphState) -> Dict[str, Any]:
         """
         Search for a relevant quote based on the user's query.
         This is OPTIONAL - if no good match, we just use the direct answer.
@@ -146,7 +226,7 @@ class CinematicPipeline:
         # Skip quote search for very short queries (< 4 words)
         if len(words) < 4:
             print("\n⏭️ [Query too short - skipping quote enhancement]")
-            return {**state, "selected_quote": None}
+            return {"selected_quote": None}
 
         print("\n🔍 [RAG] Searching for relevant quote...")
         print(f"  Query: {state['user_query']}")
@@ -155,12 +235,13 @@ class CinematicPipeline:
             self.quote_db.search_quote,
             state["user_query"],
             top_k=3,
-            used_indices=self._used_indices,
+            used_indices=set(self._used_indices),
+            query_vec=state["query_vec"],
         )
         
         if not candidates:
             print("  No quotes found")
-            return {**state, "selected_quote": None}
+            return {"selected_quote": None}
 
         best = candidates[0]
         
@@ -172,7 +253,7 @@ class CinematicPipeline:
                 f"  Match: '{best['metadata']['text'][:60]}...'\n"
                 f"  Score: {best['composite']} < {MIN_SCORE}"
             )
-            return {**state, "selected_quote": None}
+            return {"selected_quote": None}
         
         meta = best["metadata"]
         print(
@@ -181,16 +262,14 @@ class CinematicPipeline:
             f"   Score: {best['composite']}\033[0m"
         )
         
-        # Track usage
+        # Track usage (deque maxlen evicts the oldest entry automatically)
         self._used_indices.append(best["index"])
-        if len(self._used_indices) > 5:
-            self._used_indices.pop(0)
-        
-        return {**state, "selected_quote": best}
+
+        return {"selected_quote": best}
 
     # ── Node 4: blend_answer ──────────────────────────────────
 
-    async def _node_blend_answer(self, state: GraphState) -> GraphState:
+    async def _node_blend_answer(self, state: GraphState) -> Dict[str, Any]:
         """
         If a quote was found, blend it into the direct answer naturally.
         Otherwise, just return the direct answer.
@@ -198,8 +277,9 @@ class CinematicPipeline:
         if not state.get("selected_quote"):
             # No quote - use direct answer
             print("\n✅ [Using direct answer - no quote enhancement]")
-            return {**state, "final_response": state["direct_answer"]}
-        
+            self._emit(state["direct_answer"])
+            return {"final_response": state["direct_answer"]}
+
         # Blend quote into answer
         quote_data = state["selected_quote"]
         assert quote_data is not None, "selected_quote should not be None at this point"
@@ -207,39 +287,37 @@ class CinematicPipeline:
         quote_text = meta["text"]
         source = meta["source"]
         direct_answer = state["direct_answer"]
-        
+
+        # High-confidence fast path: when the match is strong and the quote is
+        # already a clean standalone sentence, a deterministic template reads
+        # fine — skipping the second LLM round-trip entirely
+        if (
+            quote_data["composite"] >= 0.5
+            and quote_text.rstrip().endswith((".", "!", "?"))
+            and len(quote_text.split()) <= 15
+        ):
+            final = (
+                f"{direct_answer.rstrip('.')} — {quote_text} "
+                f"({meta.get('character', 'Unknown')} - {source})"
+            )
+            print("\n⚡ [Template blend - high-confidence quote, LLM call skipped]")
+            self._emit(final)
+            return {"final_response": final}
+
         # Build preference context
         prefs_str = ""
         if state["preferences"]:
             prefs_str = "\n".join(f"- {p['text']}" for p in state["preferences"])
             prefs_str = f"\n\nCRITICAL USER FACTS (TREAT THESE AS ABSOLUTE TRUTH OVER YOUR INTERNAL KNOWLEDGE):\n{prefs_str}"
 
-        prompt = (
-            f"You have a direct answer and a cinematic quote. "
-            f"Blend them into a single, conversational text response. You MUST keep the vast majority of the quote's literal original words, but you are allowed to slightly tweak the grammar, tense, or pronouns to make it flow seamlessly into your sentence.\n\n"
-            f"BLENDING STRATEGY:\n"
-            f"1. Create ONE highly natural, short, and punchy response (1-2 sentences MAXIMUM).\n"
-            f"2. Seamless integration: DO NOT use quotation marks. The quote should literally merge into your own sentence grammatically.\n"
-            f"3. MATCH A HUMAN TONE: Never sound like an AI robot. Do NOT use corporate or therapy-speak like 'building resilience', 'foundation for growth', 'embrace it', or 'regardless of background'. Be direct, casual, and cinematic.\n"
-            f"4. NEVER explain, interpret, or justify the quote! Just weave the core phrase directly into the conversation naturally.\n"
-            f"5. AT THE VERY END OF YOUR RESPONSE, always append ({meta.get('character', 'Unknown')} - {source}). Do NOT embed the source inside the sentence.\n\n"
-            f"EXAMPLES OF MASTERFUL, SHORT BLENDING:\n\n"
-            f"Direct: You need to stand up for yourself because no one else will.\n"
-            f"Quote: I am the one who knocks!\n"
-            f"✅ GOOD (Start): You have to be the one who knocks, so adopt that mindset and stand up for yourself, because no one else will. (Walter White - Breaking Bad)\n\n"
-            f"Direct: It's okay to fail as long as you keep trying.\n"
-            f"Quote: There is no shame in being weak. The shame is in staying weak.\n"
-            f"✅ GOOD (Middle): It's okay to fail because there's no shame in being weak, but the real shame is just staying weak and giving up. (Sung Jin-Woo - Solo Leveling)\n\n"
-            f"Direct: Don't give up on your dreams, it takes time.\n"
-            f"Quote: Even if you are not ready for the day, it cannot always be night.\n"
-            f"✅ GOOD (End): It takes time to achieve your dreams, so don't give up entirely; even if you aren't ready for the day, it can't always be night. (Gwendolyn - Spider-Verse)\n\n"
-            f"{prefs_str}\n\n"
-            f"Context from conversation:\n{state.get('chat_history', [])}\n\n"
-            f"NOW BLEND:\n"
-            f"Direct answer: {direct_answer}\n"
-            f"Base Quote: {quote_text}\n"
-            f"Source Info (to put at the VERY end): ({meta.get('character', 'Unknown')} - {source})\n\n"
-            f"Your perfectly seamless, natural response:"
+        # chat_history is deliberately left out — blending only needs the direct
+        # answer + quote, and re-tokenizing prior turns inflates Ollama prefill.
+        prompt = BLEND_TEMPLATE.substitute(
+            direct=direct_answer,
+            quote=quote_text,
+            source=source,
+            character=meta.get("character", "Unknown"),
+            prefs=prefs_str,
         )
 
         print("\n🎨 [LLM] Blending quote into answer...")
@@ -247,17 +325,34 @@ class CinematicPipeline:
         async for chunk in self.llm.generate_stream(
             [{"role": "user", "content": prompt}],
             temperature=0.4,
+            num_predict=96,
         ):
             blended += chunk
+            self._emit(chunk)
 
         print(f"\033[96m  Final: {blended}\033[0m")
-        return {**state, "final_response": blended}
+        return {"final_response": blended}
+
+    async def _run_gatekeeper(self, user_query: str):
+        """Bounded background scan so a burst of turns can't queue unbounded LLM calls."""
+        async with self._gatekeeper_sem:
+            await self.gatekeeper.evaluate_and_store(user_query)
+
+    def _emit(self, chunk: str):
+        """Pushes a final-response chunk to the active run_stream consumer (if any)."""
+        if self._chunk_queue is not None and chunk:
+            self._chunk_queue.put_nowait(chunk)
 
     # ── Public API ────────────────────────────────────────────
 
-    async def run(self, user_query: str) -> str:
+    async def run_stream(self, user_query: str) -> AsyncIterator[str]:
+        """
+        Streams the final response chunk-by-chunk as the blend LLM decodes,
+        instead of making the caller wait for the whole generation.
+        """
         initial: GraphState = {
             "user_query":     user_query,
+            "query_vec":      None,
             "preferences":    [],
             "chat_history":   [],
             "direct_answer":  "",
@@ -265,8 +360,53 @@ class CinematicPipeline:
             "final_response": "",
         }
 
-        result: GraphState = await self._graph.ainvoke(initial)
-        
+        # Streamlit abandons consumers mid-stream routinely (any widget
+        # interaction raises inside st.write_stream, parking this generator at
+        # its yield forever). A previous run's graph task would then resume on
+        # the shared loop and _emit the OLD turn's chunks into the new turn's
+        # queue — cancel it before wiring up this run.
+        stale = self._graph_task
+        if stale is not None and not stale.done():
+            stale.cancel()
+            try:
+                await stale
+            except (asyncio.CancelledError, Exception):
+                pass
+
+        queue: asyncio.Queue = asyncio.Queue()
+        self._chunk_queue = queue
+
+        async def _invoke() -> GraphState:
+            try:
+                return await self._graph.ainvoke(initial)
+            finally:
+                queue.put_nowait(None)  # sentinel: generation finished
+
+        graph_task = asyncio.create_task(_invoke())
+        self._graph_task = graph_task
+
+        # Kick off the gatekeeper scan now so it overlaps generation instead
+        # of starting after the turn's event loop has already stopped; it only
+        # needs the raw user query
+        print("\n🕵️ (Gatekeeper scanning...)")
+        gatekeeper_task = asyncio.create_task(self._run_gatekeeper(user_query))
+        self._bg_tasks.add(gatekeeper_task)
+        gatekeeper_task.add_done_callback(self._bg_tasks.discard)
+        try:
+            while True:
+                chunk = await queue.get()
+                if chunk is None:
+                    break
+                yield chunk
+        finally:
+            # Only clear our own queue: if this generator is being finalized
+            # late (after an abandoned stream), a newer run owns the slot
+            if self._chunk_queue is queue:
+                self._chunk_queue = None
+
+        result: GraphState = await graph_task
+        self._graph_task = None
+
         # Handle parallel graph output formatting safely
         final = ""
         if isinstance(result, dict) and "final_response" in result:
@@ -276,7 +416,16 @@ class CinematicPipeline:
 
         self.chat_buffer.add_interaction(user_text=user_query, assistant_text=final)
 
-        print("\n🕵️ (Gatekeeper scanning...)")
-        asyncio.create_task(self.gatekeeper.evaluate_and_store(user_query))
+        # Await the scan before finishing: callers drive us with
+        # run_until_complete, which stops the loop the moment this generator
+        # is exhausted — an unawaited task would sit frozen until the next
+        # turn (and the session's last message would never be evaluated).
+        # The fast-path trigger check makes this free for casual chatter.
+        await gatekeeper_task
 
-        return final
+    async def run(self, user_query: str) -> str:
+        """Convenience wrapper: consumes run_stream and returns the full response."""
+        parts: list[str] = []
+        async for chunk in self.run_stream(user_query):
+            parts.append(chunk)
+        return "".join(parts)
@@ -1,28 +1,67 @@
 import re
-import json
+import orjson
 from core.llm_client import LLMClient
 from memory.vector_db import VectorDBManager
 
+try:
+    import ahocorasick  # type: ignore
+except ImportError:
+    ahocorasick = None
+
+# Purely literal triggers: scanned in linear time (Aho-Corasick automaton when
+# pyahocorasick is installed, C-level substring search otherwise)
+LITERAL_TRIGGERS = [
+    "remember",
+    "from now on",
+    "i struggle with",
+    "my goal is",
+    "call me",
+    "my name is",
+    "my favorite is",
+    "my passion is",
+]
+
+# Triggers that genuinely need alternation stay in a (much smaller) regex
+PATTERN_TRIGGERS = [
+    r"i (really |strongly )?prefer",
+    r"never (call|say|do|use)",
+    r"i (really |absolutely )?(love|hate|can't stand)",
+    r"always (use|call|refer)",
+]
+
+
 class MemoryGatekeeper:
     def __init__(self, llm_client: LLMClient, vector_db: VectorDBManager):
         self.llm = llm_client
         self.vector_db = vector_db
-        
+
         # Fast pre-flight check triggers to avoid slow LLM calls on casual chatter
         # Only strong, explicit preference statements
-        self.trigger_phrases = [
-            r"remember( that)?",
-            r"from now on",
-            r"i (really |strongly )?prefer",
-            r"i struggle with",
-            r"my goal is",
-            r"call me",
-            r"never (call|say|do|use)",
-            r"i (really |absolutely )?(love|hate|can't stand)",
-            r"always (use|call|refer)",
-            r"my (name|favorite|passion) is"
-        ]
-        self.trigger_regex = re.compile('|'.join(self.trigger_phrases), re.IGNORECASE)
+        if ahocorasick is not None:
+            self._automaton = ahocorasick.Automaton()
+            for phrase in LITERAL_TRIGGERS:
+                self._automaton.add_word(phrase, phrase)
+            self._automaton.make_automaton()
+        else:
+            self._automaton = None
+
+        self.trigger_regex = re.compile('|'.join(PATTERN_TRIGGERS), re.IGNORECASE)
+
+        # JSON schema handed to Ollama's structured-output mode: constrained
+        # decoding can't emit code fences or prose, so the reply parses directly
+        self.decision_schema = {
+            "type": "object",
+            "properties": {
+                "store": {"type": "boolean"},
+                "summary": {"type": "string"},
+                "type": {
+                    "type": "string",
+                    "enum": ["preferences", "learning_progress", "personal_context"],
+                },
+                "importance": {"type": "number"},
+            },
+            "required": ["store"],
+        }
 
         self.system_prompt = (
             "You are an internal Memory Routing Agent. The user has provided a statement. "
@@ -43,7 +82,17 @@ class MemoryGatekeeper:
         )
 
     def _fast_check(self, user_text: str) -> bool:
-        """Regex check to see if we even need to invoke the LLM."""
+        """Linear-time trigger scan to see if we even need to invoke the LLM."""
+        text_lower = user_text.lower()
+
+        # Literal triggers first: one pass over the text, no backtracking
+        if self._automaton is not None:
+            for _ in self._automaton.iter(text_lower):
+                return True
+        elif any(phrase in text_lower for phrase in LITERAL_TRIGGERS):
+            return True
+
+        # Only the alternation-style triggers fall through to regex
         return bool(self.trigger_regex.search(user_text))
 
     async def evaluate_and_store(self, user_text: str):
@@ -62,14 +111,14 @@ class MemoryGatekeeper:
             {"role": "user", "content": f"User said: {user_text}"}
         ]
         
-        # Quick non-stream call
-        response = await self.llm.generate_response(messages, temperature=0.1)
-        
+        # Quick non-stream call, constrained to the decision schema
+        response = await self.llm.generate_response(
+            messages, temperature=0.1, format=self.decision_schema, num_predict=160
+        )
+
         try:
-            # Clean up the output in case the LLM wrapped it in markdown code blocks
-            clean_json = response.replace("```json", "").replace("```", "").strip()
-            decision = json.loads(clean_json)
-            
+            decision = orjson.loads(response)
+
             if decision.get("store") is True:
                 summary = decision.get("summary", "")
                 domain = decision.get("type", "personal_context")
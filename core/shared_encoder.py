@@ -3,17 +3,50 @@ Shared Sentence Encoder Singleton.
 Loads the embedding model ONCE across all modules. Both VectorDBManager
 and QuoteDBManager import this instead of each instantiating their own
 SentenceTransformer — cuts startup time and RAM in half.
+
+Prefers the ONNX Runtime backend with INT8-quantized weights (2-4× faster
+single-query encodes on CPU, ~4× smaller in RAM); falls back to the default
+PyTorch backend when onnxruntime/optimum aren't installed.
 """
+import threading
+
 from sentence_transformers import SentenceTransformer
 
 _encoder: SentenceTransformer | None = None
+_encoder_lock = threading.Lock()
 _MODEL_NAME = "all-MiniLM-L6-v2"
 
 
+def _load_model() -> SentenceTransformer:
+    try:
+        return SentenceTransformer(
+            _MODEL_NAME,
+            backend="onnx",
+            model_kwargs={"file_name": "onnx/model_qint8_avx512_vnni.onnx"},
+        )
+    except Exception as e:
+        print(f"[Encoder] ONNX backend unavailable ({e}), falling back to PyTorch")
+        return SentenceTransformer(_MODEL_NAME)
+
+
 def get_encoder() -> SentenceTransformer:
     """Returns the global singleton encoder, loading it on first call."""
     global _encoder
     if _encoder is None:
-        print(f"[Encoder] Loading shared model ({_MODEL_NAME})...")
-        _encoder = SentenceTransformer(_MODEL_NAME)
+        # Double-checked lock: the background warmup thread and the main
+        # thread's manager constructors race here on cold start, and an
+        # unguarded load would leave two full models resident with callers
+        # split between them
+        with _encoder_lock:
+            if _encoder is None:
+                print(f"[Encoder] Loading shared model ({_MODEL_NAME})...")
+                _encoder = _load_model()
     return _encoder
+
+
+def warmup():
+    """
+    Runs one throwaway encode so kernel selection / allocator warm-up happens
+    at boot instead of on the first user query. Call from a background thread.
+    """
+    get_encoder().encode(["warmup"], convert_to_numpy=True, show_progress_bar=False)
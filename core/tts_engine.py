@@ -1,22 +1,35 @@
-import tempfile
+import asyncio
+import hashlib
 import os
 from typing import Optional
 from gtts import gTTS
 
+# Synthesized MP3s are cached here keyed by SHA1(text) so repeated phrases
+# (greetings etc.) never re-hit the network
+CACHE_DIR = "cache/tts"
+
 class TTSEngine:
-    def __init__(self):
+    def __init__(self, cache_dir: str = CACHE_DIR):
+        self.cache_dir = cache_dir
+        os.makedirs(self.cache_dir, exist_ok=True)
         print("💡 TTS engine initialized (gTTS)")
-    
+
+    def _cache_path(self, text: str) -> str:
+        digest = hashlib.sha1(text.encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, f"{digest}.mp3")
+
     def generate_speech(self, text: str, output_path: Optional[str] = None) -> Optional[str]:
         if not output_path:
-            temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.mp3')
-            output_path = temp_file.name
-            temp_file.close()
-        
+            output_path = self._cache_path(text)
+
         try:
             if output_path.endswith('.wav'):
                 output_path = output_path.replace('.wav', '.mp3')
-            
+
+            # Cache hit: identical text was already synthesized
+            if os.path.exists(output_path) and os.path.getsize(output_path) > 0:
+                return output_path
+
             tts = gTTS(text=text, lang='en', slow=False)
             tts.save(output_path)
             return output_path
@@ -24,6 +37,10 @@ class TTSEngine:
             print(f"❌ gTTS failed: {e}")
             return None
 
+    async def agenerate_speech(self, text: str, output_path: Optional[str] = None) -> Optional[str]:
+        """Thread-offloaded synthesis so the network call never blocks the event loop."""
+        return await asyncio.to_thread(self.generate_speech, text, output_path)
+
 _tts_engine = None
 
 def get_tts_engine() -> TTSEngine:
@@ -11,7 +11,7 @@ Scoring formula per candidate quote:
 Emotion vectors are embedded ONCE at load time from distinct emotion labels.
 No extra model loads, no extra FAISS index, zero overhead at query time.
 """
-import json
+import orjson
 import os
 from typing import Optional, Any, List, Dict, cast
 import faiss  # type: ignore
@@ -28,16 +28,31 @@ class QuoteDBManager:
     def __init__(
         self,
         json_path:  str = "data/quote_dictionary.json",
-        index_path: str = "data/indexes/quote.index",
+        index_path: str = "data/indexes/quote_hnsw.index",
     ):
         self.json_path: str = json_path
         self.index_path: str = index_path
         self.model = get_encoder()
-        self.quotes: List[Dict[str, Any]] = []
         self.index: Any = None
 
+        # Struct-of-Arrays quote storage: parallel lists indexed by quote id
+        # instead of a list of per-quote dicts (result metadata is rebuilt
+        # on demand for the handful of winners per query)
+        self._ids:        List[str] = []
+        self._texts:      List[str] = []
+        self._types:      List[str] = []
+        self._characters: List[str] = []
+        self._sources:    List[str] = []
+        self._emotions:   List[str] = []
+        self._usecases:   List[str] = []
+
         # Pre-computed emotion vectors  {label: unit_vec}
         self._emotion_vecs: dict = {}
+        # Integer-id indirection: quote i -> emotion id -> unit vector row.
+        # Keeps per-quote storage at one int32 and turns candidate lookup
+        # into two contiguous array gathers plus a matmul
+        self._emotion_id_of_quote: Any = None   # (N,) int32
+        self._emotion_vec_by_id:   Any = None   # (num_emotions, d) float32
 
         self._load_or_build()
 
@@ -49,33 +64,48 @@ class QuoteDBManager:
         if not os.path.exists(self.json_path):
             raise FileNotFoundError(f"Missing {self.json_path}")
 
-        with open(self.json_path, "r", encoding="utf-8") as f:
-            self.quotes = json.load(f)
+        # orjson parses several times faster than stdlib json; the dict list
+        # is transient — only the SoA columns are kept alive
+        with open(self.json_path, "rb") as f:
+            raw_quotes = orjson.loads(f.read())
+
+        self._ids        = [q.get("id", "") for q in raw_quotes]
+        self._texts      = [q.get("text", "") for q in raw_quotes]
+        self._types      = [q.get("type", "quote") for q in raw_quotes]
+        self._characters = [q.get("character", "Unknown") for q in raw_quotes]
+        self._sources    = [q.get("source", "") for q in raw_quotes]
+        self._emotions   = [q.get("emotion", "general") for q in raw_quotes]
+        self._usecases   = [q.get("usecase", "") for q in raw_quotes]
 
         # FAISS index on quote USECASE/CONTEXT instead of raw text
         if os.path.exists(self.index_path):
-            self.index = faiss.read_index(self.index_path)
+            # mmap keeps RSS down to FAISS metadata; the OS pages vectors in on demand
+            self.index = faiss.read_index(
+                self.index_path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY
+            )
         else:
             print("🏗️ Building Cinematic Quote Index (Usecase Architecture)...")
             texts = []
-            for q in self.quotes:
+            for text, usecase, emotion in zip(self._texts, self._usecases, self._emotions):
                 # Merge the quote text and its situational usecase so the vector contains BOTH
-                base_usecase = q.get("usecase", "")
-                if not base_usecase:
-                    emotion = q.get("emotion", "general")
-                    base_usecase = f"Situation: User needs a quote about {emotion}."
-                
+                base_usecase = usecase or f"Situation: User needs a quote about {emotion}."
+
                 # The final document embedded in FAISS contains literal quote AND situational usecase
-                compound_doc = f"Quote: {q['text']}. {base_usecase}"
+                compound_doc = f"Quote: {text}. {base_usecase}"
                 texts.append(compound_doc)
-                
-            embs = self.model.encode(texts, convert_to_numpy=True)
-            # Normalize for Cosine Similarity
-            faiss.normalize_L2(embs)
-            embs = embs.astype("float32")
-            
+
+            # Normalize inside the encoder forward (fused with pooling) and make
+            # the buffer contiguous float32 up front — no extra normalize pass/copy
+            embs = np.ascontiguousarray(
+                self.model.encode(texts, convert_to_numpy=True, normalize_embeddings=True),
+                dtype="float32",
+            )
+
             d = embs.shape[1]
-            index_obj = faiss.IndexFlatIP(d)  # Inner Product (Cosine Sim)
+            # HNSW graph search: O(log N) hops per query instead of brute-force
+            # O(N) inner products, at >95% recall for this corpus size.
+            index_obj = faiss.IndexHNSWFlat(d, 32, faiss.METRIC_INNER_PRODUCT)
+            index_obj.hnsw.efConstruction = 200
             index_obj.add(embs)
             faiss.write_index(index_obj, self.index_path)
             self.index = index_obj
@@ -85,22 +115,32 @@ class QuoteDBManager:
 
     def _build_emotion_cache(self):
         """Embed each distinct emotion label once and cache as unit vectors."""
-        emotions = list({q.get("emotion", "general") for q in self.quotes})
-        vecs     = self.model.encode(emotions, convert_to_numpy=True).astype("float32")
-        # Normalize to unit vectors for cosine similarity via dot product
-        norms = np.linalg.norm(vecs, axis=1, keepdims=True)
-        norms[norms == 0] = 1.0
-        unit_vecs = vecs / norms
+        emotions = list(set(self._emotions))
+        # normalize_embeddings=True gives unit vectors straight from the
+        # encoder — cosine similarity via dot product, no manual norm pass
+        unit_vecs = self.model.encode(
+            emotions, convert_to_numpy=True, normalize_embeddings=True
+        ).astype("float32")
         self._emotion_vecs = dict(zip(emotions, unit_vecs))
 
-    # ── Helpers ───────────────────────────────────────────────
-
-    def _emotion_sim(self, query_unit_vec: np.ndarray, emotion_label: str) -> float:
-        """Cosine similarity between query vector and an emotion label vector."""
-        emotion_vec = self._emotion_vecs.get(emotion_label)
-        if emotion_vec is None:
-            return 0.0
-        return float(np.dot(query_unit_vec, emotion_vec))
+        # One row per distinct emotion, plus an int32 id per quote — search_quote
+        # scores all FAISS candidates via array gathers and a single matmul
+        emotion_to_id = {label: i for i, label in enumerate(emotions)}
+        self._emotion_vec_by_id = unit_vecs
+        self._emotion_id_of_quote = np.array(
+            [emotion_to_id[label] for label in self._emotions], dtype=np.int32
+        )
+
+    def _quote_metadata(self, idx: int) -> Dict[str, Any]:
+        """Reconstructs a per-quote metadata dict from the SoA columns."""
+        return {
+            "id":        self._ids[idx],
+            "text":      self._texts[idx],
+            "type":      self._types[idx],
+            "character": self._characters[idx],
+            "source":    self._sources[idx],
+            "emotion":   self._emotions[idx],
+        }
 
     # ── Public Search ─────────────────────────────────────────
 
@@ -108,74 +148,90 @@ class QuoteDBManager:
         self,
         query:        str,
         top_k:        int  = 5,
-        used_indices: list = [],
+        used_indices: Optional[set] = None,
+        query_vec:    Optional[np.ndarray] = None,
     ) -> List[Dict[str, Any]]:
         """
         Returns up to top_k candidates sorted by composite score (highest first).
         Each result dict has: index, semantic_sim, emotion_sim, type_weight,
         composite_score, metadata.
+        Pass a pre-computed unit-normalized `query_vec` (shape (1, d)) to skip
+        the encoder forward entirely.
         """
         idx_obj = self.index
         if idx_obj is None:
             return []
-        
-        # Encode query and normalize for Cosine Similarity index
-        raw_vec = self.model.encode([query], convert_to_numpy=True)
-        faiss.normalize_L2(raw_vec)
-        raw_vec = raw_vec.astype("float32")
+
+        # Set membership keeps the used-quote filter O(1) per candidate
+        # (and avoids the shared-mutable-default footgun)
+        used_indices = used_indices or set()
+
+        if query_vec is not None:
+            raw_vec = query_vec
+        else:
+            # Encode query pre-normalized for the Cosine Similarity index
+            raw_vec = self.model.encode(
+                [query],
+                convert_to_numpy=True,
+                normalize_embeddings=True,
+                batch_size=1,
+                show_progress_bar=False,
+            ).astype("float32")
 
         # Unit vector mapping for emotion metadata comparison
         query_unit = raw_vec
 
+        # Widen the HNSW beam with the requested depth so recall holds up
+        idx_obj.hnsw.efSearch = max(32, top_k * 8)
+
         # FAISS over-fetch so we have room to filter used indices
         fetch_k = min(top_k * 4, int(idx_obj.ntotal))
         distances, indices = idx_obj.search(raw_vec, fetch_k)  # type: ignore
 
-        results: list[dict[str, Any]] = []
-        for dist_item, idx_item in zip(distances[0], indices[0]):  # type: ignore
-            idx = int(idx_item)
-            # distances from IndexFlatIP with normalized vectors are exactly cosine similarities (0.0 to 1.0 typically)
-            cosine_sim = float(dist_item)
-            
-            if idx == -1 or idx in used_indices:
-                continue
-
-            quote_data = self.quotes[idx]
-
-            # ── Signal 1: Semantic similarity (Cosine: -1.0 to 1.0, clip to 0) ──
-            semantic_sim = max(0.0, cosine_sim)
-
-            # ── Signal 2: Emotion match ──────────────────────────
-            emotion_label = quote_data.get("emotion", "general")
-            emotion_sim   = max(0.0, self._emotion_sim(query_unit[0], emotion_label))
-
-            # ── Composite ─────────────────────────────────────────
-            composite: float = (
-                W_SEMANTIC * semantic_sim
-                + W_EMOTION  * emotion_sim
-            )
-
-            results.append({
-                "index":         idx,
-                "semantic_sim":  float(f"{semantic_sim:.3f}"),
-                "emotion_sim":   float(f"{emotion_sim:.3f}"),
+        # One SGEMV over the candidate rows replaces a per-candidate np.dot loop
+        # (clip -1 padding indices to 0; those rows get masked out below anyway)
+        cand_ids = self._emotion_id_of_quote[np.maximum(indices[0], 0)]
+        emo_sims = self._emotion_vec_by_id[cand_ids] @ query_unit[0]
+
+        # ── Fused composite scoring (pure NumPy, no per-candidate dicts) ──
+        # distances from the inner-product index with normalized vectors are
+        # exactly cosine similarities, clipped to 0 like before
+        semantic_sims = np.maximum(0.0, distances[0])
+        emotion_sims  = np.maximum(0.0, emo_sims)
+        composite     = W_SEMANTIC * semantic_sims + W_EMOTION * emotion_sims
+
+        # Mask out padding hits and already-used quotes by sinking their score
+        invalid = indices[0] == -1
+        if used_indices:
+            invalid |= np.isin(indices[0], list(used_indices))
+        composite = np.where(invalid, -np.inf, composite)
+
+        # argpartition is O(N); only the k winners get fully sorted
+        n_valid = int((~invalid).sum())
+        k = min(top_k, n_valid)
+        if k == 0:
+            return []
+        top = np.argpartition(-composite, k - 1)[:k]
+        top = top[np.argsort(-composite[top])]
+
+        # Materialize result dicts only for the winners
+        return [
+            {
+                "index":         int(indices[0][pos]),
+                "semantic_sim":  round(float(semantic_sims[pos]), 3),
+                "emotion_sim":   round(float(emotion_sims[pos]), 3),
                 "type_weight":   1.0,
-                "composite":     float(f"{composite:.3f}"),
-                "metadata":      quote_data,
-            })
-
-        # Sort highest composite first
-        results.sort(key=lambda x: x["composite"], reverse=True)
-        top_results: list[dict[str, Any]] = []
-        for i in range(min(top_k, len(results))):
-            top_results.append(results[i])
-        return top_results
+                "composite":     round(float(composite[pos]), 3),
+                "metadata":      self._quote_metadata(int(indices[0][pos])),
+            }
+            for pos in top
+        ]
 
     def search_catchphrase(
         self,
         query:        str,
         top_k:        int  = 3,
-        used_indices: list = [],
+        used_indices: Optional[set] = None,
     ) -> list:
         """
         Search specifically for catchphrases (type='catchphrase').
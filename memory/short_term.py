@@ -7,25 +7,31 @@ class ConversationBuffer:
         Each 'turn' is a tuple or dictionary of (user_input, assistant_output).
         """
         self.buffer = deque(maxlen=max_turns)
+        # Memoized get_history_string output; invalidated on any mutation
+        self._cached_string: str | None = None
 
     def add_interaction(self, user_text: str, assistant_text: str):
         self.buffer.append({"role": "user", "content": user_text})
         self.buffer.append({"role": "assistant", "content": assistant_text})
+        self._cached_string = None
 
     def get_history(self) -> list:
         """Returns the raw list of dictionaries formatted for Ollama/OpenAI API."""
         return list(self.buffer)
-        
+
     def get_history_string(self) -> str:
         """Returns a formatted string of the recent conversation history for prompt injection."""
         if not self.buffer:
             return "No previous context."
-            
-        history_str = ""
-        for msg in self.buffer:
-            role = "User" if msg["role"] == "user" else "Assistant"
-            history_str += f"{role}: {msg['content']}\n"
-        return history_str
+
+        if self._cached_string is None:
+            # Single join allocation instead of O(n²) += concatenation
+            self._cached_string = "\n".join(
+                f"{'User' if msg['role'] == 'user' else 'Assistant'}: {msg['content']}"
+                for msg in self.buffer
+            )
+        return self._cached_string
 
     def clear(self):
         self.buffer.clear()
+        self._cached_string = None
@@ -1,10 +1,61 @@
 import os
-import json
+import base64
+import orjson
 import time
+import hashlib
+import shelve
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import faiss
 import numpy as np
 from core.shared_encoder import get_encoder
 
+
+class _LazyDomainDict(dict):
+    """
+    Domain registry that defers loading static dictionary domains until their
+    first access. Registered-but-unloaded domains still answer `in` checks, so
+    callers don't need to know whether a domain has been materialized yet.
+    """
+    def __init__(self, manager):
+        super().__init__()
+        self._manager = manager
+        self._pending = {}       # domain_name -> source_json_path
+        self._domain_locks = {}  # domain_name -> threading.Lock
+
+    def register(self, domain_name: str, source_json_path: str):
+        self._pending[domain_name] = source_json_path
+
+    def materialize(self, key):
+        """
+        Loads a pending domain. The registry lock only guards the bookkeeping
+        dicts; the load itself runs under a per-domain lock, so warmup threads
+        and lazy access overlap loads of DIFFERENT domains while still
+        building any given domain exactly once.
+        """
+        with self._manager._registry_lock:
+            if super().__contains__(key):
+                return
+            source = self._pending.get(key)
+            if source is None:
+                return
+            lock = self._domain_locks.setdefault(key, threading.Lock())
+        with lock:
+            if super().__contains__(key):
+                return  # lost the race — another thread finished the load
+            self._manager._load_or_build_index(key, source)
+            with self._manager._registry_lock:
+                self._pending.pop(key, None)
+
+    def __getitem__(self, key):
+        if not super().__contains__(key) and key in self._pending:
+            self.materialize(key)
+        return super().__getitem__(key)
+
+    def __contains__(self, key):
+        return super().__contains__(key) or key in self._pending
+
+
 class VectorDBManager:
     def __init__(self, data_dir: str = "data", index_dir: str = "data/indexes", model_name: str = "all-MiniLM-L6-v2"):
         """
@@ -17,10 +68,25 @@ class VectorDBManager:
         os.makedirs(self.index_dir, exist_ok=True)
         
         self.model = get_encoder()
+        self.model_name = model_name
         self.dimension = self.model.get_sentence_embedding_dimension()
-        
-        # Format: {"domain": {"index": faiss.IndexFlatL2, "data": [{"text": str, "timestamp": float, "importance": float, "type": str}]}}
-        self.databases = {}
+
+        # On-disk embedding cache keyed by (model_name, SHA256(text)): repeated
+        # texts/queries become a dict lookup instead of a transformer forward,
+        # and it survives restarts. Namespacing by model_name self-invalidates
+        # if the embedding model ever changes.
+        self._emb_cache = shelve.open(os.path.join(index_dir, "embedding_cache"))
+
+        # Small in-RAM query cache in front of the shelve cache: searching
+        # several domains for the same user turn hits a plain dict instead of
+        # paying the shelve lookup + frombuffer copy N-1 extra times. FIFO
+        # eviction — dicts preserve insertion order.
+        self._query_cache: dict = {}
+        self._QUERY_CACHE_SIZE = 32
+
+        # Format: {"domain": {"index": faiss.IndexIDMap2, "data": {id: {"text": str, "timestamp": float, "importance": float, "type": str}}, "next_id": int}}
+        self._registry_lock = threading.Lock()
+        self.databases = _LazyDomainDict(self)
         self._sync_all_indexes()
 
     def _sync_all_indexes(self):
@@ -29,79 +95,333 @@ class VectorDBManager:
             os.makedirs(self.data_dir, exist_ok=True)
             return
 
+        # Static dictionary domains are registered lazily: a session that never
+        # queries them never pays their load/build cost or RAM
         json_files = [f for f in os.listdir(self.data_dir) if f.endswith(".json")]
         for filename in json_files:
             domain_name = filename.replace(".json", "")
-            self._load_or_build_index(domain_name, os.path.join(self.data_dir, filename))
-            
+            self.databases.register(domain_name, os.path.join(self.data_dir, filename))
+
         # Ensure our personal Long-Term memory domains exist even if empty
+        # (these stay eager — they're written to and replay a WAL)
         for domain in ["preferences", "learning_progress", "personal_context"]:
             if domain not in self.databases:
                 self._init_empty_domain(domain)
 
+        # Warm the registered static domains in the background: per-domain
+        # loads are independent and both FAISS and encoder inference release
+        # the GIL, so a small pool overlaps their disk IO (and any rebuild
+        # encodes) without blocking startup. materialize() locks per domain,
+        # so the workers genuinely run in parallel and a first query racing
+        # the warmup still loads its domain exactly once.
+        pending = list(self.databases._pending)
+        if pending:
+            pool = ThreadPoolExecutor(max_workers=min(8, os.cpu_count() or 1))
+            for name in pending:
+                pool.submit(self.databases.materialize, name)
+            pool.shutdown(wait=False)
+
+    def _encode_cached(self, text: str) -> np.ndarray:
+        """Encodes a single text (L2-normalized), short-circuiting through the on-disk cache."""
+        key = hashlib.sha256(f"{self.model_name}|{text}".encode()).hexdigest()
+        cached = self._emb_cache.get(key)
+        if cached is not None:
+            return np.frombuffer(cached, dtype=np.float32).reshape(1, self.dimension)
+
+        embedding = self.model.encode(
+            [text], convert_to_numpy=True, normalize_embeddings=True
+        ).astype(np.float32)
+        self._emb_cache[key] = embedding.tobytes()
+        self._emb_cache.sync()
+        return embedding
+
+    def _get_query_embedding(self, query: str) -> np.ndarray:
+        """Request-scoped memoization of query encodes across domain searches."""
+        cached = self._query_cache.get(query)
+        if cached is not None:
+            return cached
+        embedding = self._encode_cached(query)
+        if len(self._query_cache) >= self._QUERY_CACHE_SIZE:
+            self._query_cache.pop(next(iter(self._query_cache)))
+        self._query_cache[query] = embedding
+        return embedding
+
+    # Merge the WAL back into the base index/meta once it grows past this
+    WAL_MERGE_THRESHOLD = 256
+
+    def _wal_path(self, domain_name: str) -> str:
+        return os.path.join(self.index_dir, f"{domain_name}_wal.jsonl")
+
+    def _append_wal(self, domain_name: str, new_id: int, embedding: np.ndarray, memory_obj: dict):
+        """O(1) persistence for a single add: one JSONL record instead of a full rewrite."""
+        record = orjson.dumps({
+            "id": new_id,
+            "vec": base64.b64encode(embedding.astype(np.float32).tobytes()).decode(),
+            "meta": memory_obj,
+        })
+        with open(self._wal_path(domain_name), 'ab') as f:
+            f.write(record + b"\n")
+        self.databases[domain_name]["wal_len"] = self.databases[domain_name].get("wal_len", 0) + 1
+
+    def _replay_wal(self, domain_name: str):
+        """Re-applies WAL records on top of the freshly loaded base index/meta."""
+        db = self.databases[domain_name]
+        db["wal_len"] = 0
+        wal_path = self._wal_path(domain_name)
+        if not os.path.exists(wal_path):
+            return
+        with open(wal_path, 'rb') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                record = orjson.loads(line)
+                vec = np.frombuffer(
+                    base64.b64decode(record["vec"]), dtype=np.float32
+                ).reshape(1, self.dimension)
+                db["index"].add_with_ids(vec, np.array([record["id"]], dtype='int64'))
+                db["data"][record["id"]] = record["meta"]
+                db["next_id"] = max(db["next_id"], record["id"] + 1)
+                db["wal_len"] += 1
+
+    def _checkpoint(self, domain_name: str):
+        """Full rewrite of index + meta, then truncates the WAL."""
+        self._save_domain(domain_name)
+        wal_path = self._wal_path(domain_name)
+        if os.path.exists(wal_path):
+            os.remove(wal_path)
+        self.databases[domain_name]["wal_len"] = 0
+
+    def _new_index(self):
+        """
+        ID-mapped flat inner-product index: with L2-normalized embeddings the
+        returned scores are cosine similarities in [-1, 1], so relevance
+        thresholds are model-invariant and need no distance inversion.
+        Supports remove_ids/add_with_ids for in-place updates.
+        """
+        return faiss.IndexIDMap2(faiss.IndexFlatIP(self.dimension))
+
+    # Above this corpus size, brute-force flat search starts to hurt and the
+    # static dictionaries graduate to ANN
+    HNSW_THRESHOLD = 1000
+
+    def _new_static_index(self, n_items: int):
+        """
+        Index for read-only dictionary domains. Large corpora get HNSW
+        (log-N graph search, >95% recall at M=32); small ones get a flat
+        scan over int8 scalar-quantized vectors — 4x less RAM/disk than
+        float32 and half the bytes moved per distance computation, at <1%
+        recall loss for MiniLM-scale embeddings. Mutable personal domains
+        never use this — they need exact float scores for the dedup
+        threshold, plus remove_ids for in-place overwrites.
+        """
+        if n_items > self.HNSW_THRESHOLD:
+            base = faiss.IndexHNSWFlat(self.dimension, 32, faiss.METRIC_INNER_PRODUCT)
+            base.hnsw.efConstruction = 80
+            base.hnsw.efSearch = 32
+            return faiss.IndexIDMap2(base)
+        base = faiss.IndexScalarQuantizer(
+            self.dimension, faiss.ScalarQuantizer.QT_8bit, faiss.METRIC_INNER_PRODUCT
+        )
+        return faiss.IndexIDMap2(base)
+
+    def _rebuild_soa(self, db: dict):
+        """
+        (Re)builds the parallel SoA arrays indexed by memory id that the
+        vectorized scorer gathers from: timestamps, importances, and a
+        has_decay flag (static dictionary entries carry no timestamp).
+        """
+        n = db["next_id"]
+        timestamps  = np.zeros(n, dtype=np.float64)
+        importances = np.full(n, 0.5, dtype=np.float32)
+        has_decay   = np.zeros(n, dtype=bool)
+        for i, m in db["data"].items():
+            ts = m.get("timestamp")
+            if ts is not None:
+                timestamps[i] = ts
+                has_decay[i] = True
+            imp = m.get("importance")
+            if imp is not None:
+                importances[i] = imp
+        db["timestamps"]  = timestamps
+        db["importances"] = importances
+        db["has_decay"]   = has_decay
+        # Exact-text reverse map: lets add_memory recognize verbatim repeats
+        # before spending an encoder forward on them
+        db["text_to_idx"] = {m["text"]: i for i, m in db["data"].items() if "text" in m}
+
     def _init_empty_domain(self, domain_name: str):
         """Creates an empty FAISS index for dynamic memory insertion."""
         index_path = os.path.join(self.index_dir, f"{domain_name}.index")
         meta_path = os.path.join(self.index_dir, f"{domain_name}_meta.json")
-        
+
         if os.path.exists(index_path) and os.path.exists(meta_path):
-            with open(meta_path, 'r', encoding='utf-8') as f:
-                cached_meta = json.load(f)
-            self.databases[domain_name] = {
-                "index": faiss.read_index(index_path),
-                "data": cached_meta["data"]
-            }
+            with open(meta_path, 'rb') as f:
+                cached_meta = orjson.loads(f.read())
+
+            if "next_id" in cached_meta and cached_meta.get("metric") == "ip":
+                # Current format: data keyed by id (JSON stringifies the keys)
+                self.databases[domain_name] = {
+                    "index": faiss.read_index(index_path),
+                    "data": {int(k): v for k, v in cached_meta["data"].items()},
+                    "next_id": cached_meta["next_id"],
+                }
+                self._replay_wal(domain_name)
+                if self.databases[domain_name]["wal_len"] >= self.WAL_MERGE_THRESHOLD:
+                    self._checkpoint(domain_name)
+            else:
+                # Legacy-format meta (list data or L2 metric): migrate once by
+                # re-encoding into an ID-mapped inner-product index
+                raw = cached_meta["data"]
+                entries = raw.values() if isinstance(raw, dict) else raw
+                data = {i: m for i, m in enumerate(entries)}
+                index = self._new_index()
+                if data:
+                    embeddings = self.model.encode(
+                        [m["text"] for m in data.values()],
+                        batch_size=1024, convert_to_numpy=True,
+                        show_progress_bar=False, normalize_embeddings=True,
+                    )
+                    index.add_with_ids(embeddings, np.arange(len(data), dtype='int64'))
+                self.databases[domain_name] = {
+                    "index": index,
+                    "data": data,
+                    "next_id": len(data),
+                }
+                self._save_domain(domain_name)
         else:
             self.databases[domain_name] = {
-                "index": faiss.IndexFlatL2(self.dimension),
-                "data": []
+                "index": self._new_index(),
+                "data": {},
+                "next_id": 0,
             }
-            faiss.write_index(self.databases[domain_name]["index"], index_path)
-            with open(meta_path, 'w', encoding='utf-8') as f:
-                json.dump({"data": []}, f)
+            self._save_domain(domain_name)
+
+        self._rebuild_soa(self.databases[domain_name])
+
+    # Bump to invalidate every static cache when the on-disk format changes
+    _STATIC_FORMAT_VERSION = 4
+
+    def _source_fingerprint(self, source_json_path: str) -> str:
+        """
+        Cheap identity of a source JSON: mtime, size, and a hash of the first
+        4 KB. Comparing this tiny string decides "no rebuild needed" without
+        parsing the (potentially large) cached meta JSON.
+        """
+        st = os.stat(source_json_path)
+        with open(source_json_path, 'rb') as f:
+            head = f.read(4096)
+        digest = hashlib.sha1(head).hexdigest()
+        return f"{st.st_mtime}:{st.st_size}:{digest}:v{self._STATIC_FORMAT_VERSION}"
+
+    def _load_cached_embeddings(self, vecs_path: str, source_fp: str):
+        """
+        Returns the fp16-sidecar embeddings (upcast to float32) if they were
+        computed from the current source JSON, else None. Lets a format-driven
+        index rebuild skip the encoder forward over the whole corpus.
+        """
+        fp_path = vecs_path + ".fingerprint"
+        if not (os.path.exists(vecs_path) and os.path.exists(fp_path)):
+            return None
+        with open(fp_path, 'rb') as f:
+            if f.read().decode() != source_fp:
+                return None
+        embeddings = np.load(vecs_path).astype(np.float32)
+        # fp16 round-trip nudges vectors off unit length; renormalize so
+        # inner-product scores stay exact cosines
+        faiss.normalize_L2(embeddings)
+        return embeddings
+
+    def _save_cached_embeddings(self, vecs_path: str, source_fp: str, embeddings: np.ndarray):
+        """Persists corpus embeddings as float16 — half the disk and load IO."""
+        np.save(vecs_path, embeddings.astype(np.float16))
+        with open(vecs_path + ".fingerprint", 'wb') as f:
+            f.write(source_fp.encode())
 
     def _load_or_build_index(self, domain_name: str, source_json_path: str):
         """(Legacy Static Load) For standard dictionaries that don't need timestamps."""
         index_path = os.path.join(self.index_dir, f"{domain_name}.index")
         meta_path = os.path.join(self.index_dir, f"{domain_name}_meta.json")
-        current_mtime = os.path.getmtime(source_json_path)
-        
+        fp_path = os.path.join(self.index_dir, f"{domain_name}.fingerprint")
+        vecs_path = os.path.join(self.index_dir, f"{domain_name}.vecs.fp16.npy")
+        current_fp = self._source_fingerprint(source_json_path)
+
+        # O(1) invalidation: compare the fingerprint sidecar before touching
+        # the meta JSON at all. A match implies the current format (the
+        # version suffix bumps on format changes), so the legacy-marker
+        # checks are folded into the fingerprint.
         needs_rebuild = True
-        if os.path.exists(index_path) and os.path.exists(meta_path):
-            with open(meta_path, 'r', encoding='utf-8') as f:
-                cached_meta = json.load(f)
-            if cached_meta.get("source_mtime") == current_mtime:
+        if os.path.exists(index_path) and os.path.exists(meta_path) and os.path.exists(fp_path):
+            with open(fp_path, 'rb') as f:
+                cached_fp = f.read().decode()
+            if cached_fp == current_fp:
+                with open(meta_path, 'rb') as f:
+                    cached_meta = orjson.loads(f.read())
                 needs_rebuild = False
+                # Static domains are read-only: mmap defers paging the vectors
+                # to first access instead of reading them all into RAM
                 self.databases[domain_name] = {
-                    "index": faiss.read_index(index_path),
-                    "data": cached_meta["data"]
+                    "index": faiss.read_index(
+                        index_path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY
+                    ),
+                    "data": {int(k): v for k, v in cached_meta["data"].items()},
+                    "next_id": cached_meta["next_id"],
                 }
-        
+
         if needs_rebuild:
-            with open(source_json_path, 'r', encoding='utf-8') as f:
-                raw_data = json.load(f)
-                
-            new_index = faiss.IndexFlatL2(self.dimension)
-            valid_data = []
+            with open(source_json_path, 'rb') as f:
+                raw_data = orjson.loads(f.read())
+
+            valid_data = {}
             corpus = []
-            
+
             for item in raw_data:
                 combined_text = " | ".join([f"{k}: {v}" for k, v in item.items() if isinstance(v, str)])
                 if combined_text.strip():
+                    # Persist the joined string with the item: the embed
+                    # corpus and format_search_results both want it, so it's
+                    # computed exactly once per item per rebuild
+                    item["_search_text"] = combined_text
+                    valid_data[len(corpus)] = item
                     corpus.append(combined_text)
-                    valid_data.append(item) 
-            
+
+            new_index = self._new_static_index(len(corpus))
             if corpus:
-                embeddings = self.model.encode(corpus, convert_to_numpy=True)
-                new_index.add(embeddings)
-                
+                # Rebuilds triggered by a format bump (same source JSON) reuse
+                # the fp16 embedding sidecar instead of re-running the encoder.
+                # Keyed by source content only — the format version is
+                # deliberately stripped, since the vectors don't depend on it.
+                content_fp = current_fp.rsplit(":", 1)[0]
+                embeddings = self._load_cached_embeddings(vecs_path, content_fp)
+                if embeddings is None or len(embeddings) != len(corpus):
+                    # Large explicit batch: sentence-transformers length-sorts
+                    # within batches, so big batches minimize padding waste
+                    embeddings = self.model.encode(
+                        corpus, batch_size=1024, convert_to_numpy=True,
+                        show_progress_bar=False, normalize_embeddings=True,
+                    )
+                    self._save_cached_embeddings(vecs_path, content_fp, embeddings)
+                # The scalar quantizer learns its per-dimension ranges from
+                # the corpus; train() is a no-op for the flat/HNSW variants
+                new_index.train(embeddings)
+                new_index.add_with_ids(embeddings, np.arange(len(corpus), dtype='int64'))
+
             self.databases[domain_name] = {
                 "index": new_index,
-                "data": valid_data
+                "data": valid_data,
+                "next_id": len(corpus),
             }
             faiss.write_index(new_index, index_path)
-            with open(meta_path, 'w', encoding='utf-8') as f:
-                json.dump({"source_mtime": current_mtime, "data": valid_data}, f)
+            with open(meta_path, 'wb') as f:
+                f.write(orjson.dumps(
+                    {"data": valid_data, "next_id": len(corpus), "metric": "ip"},
+                    option=orjson.OPT_NON_STR_KEYS,
+                ))
+            # Sidecar written last so a crash mid-rebuild leaves no valid fingerprint
+            with open(fp_path, 'wb') as f:
+                f.write(current_fp.encode())
+
+        self._rebuild_soa(self.databases[domain_name])
 
     def _save_domain(self, domain_name: str):
         """Standard helper to physically dump the FAISS index and JSON Meta array to disk"""
@@ -109,8 +429,13 @@ class VectorDBManager:
         index_path = os.path.join(self.index_dir, f"{domain_name}.index")
         meta_path = os.path.join(self.index_dir, f"{domain_name}_meta.json")
         faiss.write_index(db["index"], index_path)
-        with open(meta_path, 'w', encoding='utf-8') as f:
-            json.dump({"data": db["data"]}, f)
+        # orjson serializes the meta dict ~5-10x faster than stdlib json;
+        # OPT_NON_STR_KEYS handles the int memory ids
+        with open(meta_path, 'wb') as f:
+            f.write(orjson.dumps(
+                {"data": db["data"], "next_id": db["next_id"], "metric": "ip"},
+                option=orjson.OPT_NON_STR_KEYS,
+            ))
 
     def add_memory(self, domain_name: str, text: str, importance: float = 0.5, mem_type: str = "general"):
         """
@@ -121,125 +446,209 @@ class VectorDBManager:
             self._init_empty_domain(domain_name)
             
         db = self.databases[domain_name]
-        
-        # 1. Compute Vector for the new memory
-        embedding = self.model.encode([text], convert_to_numpy=True)
+
+        # 0. Degenerate case first: a verbatim repeat ("I like coffee", again)
+        # needs no encoder forward and no FAISS search — just refresh the
+        # existing slot's metadata
+        match_idx = db["text_to_idx"].get(text)
+        if match_idx is not None:
+            memory_obj = db["data"][match_idx]
+            memory_obj["timestamp"]  = time.time()
+            memory_obj["importance"] = importance
+            memory_obj["type"]       = mem_type
+            db["timestamps"][match_idx]  = memory_obj["timestamp"]
+            db["importances"][match_idx] = importance
+            db["has_decay"][match_idx]   = True
+            self._checkpoint(domain_name)
+            print(f"🔄 [Memory Refresh] Exact repeat in '{domain_name}': {text[:50]}...")
+            return
+
+        # 1. Compute Vector for the new memory (cache-aware). This single
+        # embedding serves both the dedup search and the index insert below —
+        # the text is never encoded twice on either path.
+        embedding = self._encode_cached(text)
+        assert embedding.shape == (1, self.dimension)
         
         # 2. Deduplication / Overwrite Check
         if db["index"].ntotal > 0:
             distances, indices = db["index"].search(embedding, 1)
-            # Threshold Check: Distance < 1.0 means the semantic meaning is basically identical
-            if indices[0][0] != -1 and distances[0][0] < 1.0:
-                match_idx = indices[0][0]
+            # Threshold Check: cosine similarity > 0.85 means the semantic meaning is basically identical
+            if indices[0][0] != -1 and distances[0][0] > 0.85:
+                match_idx = int(indices[0][0])
                 old_text = db['data'][match_idx]['text']
                 print(f"🔄 [Memory Update] Overwriting old memory: '{old_text[:40]}...' -> '{text[:40]}...'")
-                
-                # Update the JSON tracking metadata
+
+                # Update the JSON tracking metadata (and the reverse map)
+                db["text_to_idx"].pop(old_text, None)
+                db["text_to_idx"][text] = match_idx
                 db["data"][match_idx] = {
                     "text": text,
                     "timestamp": time.time(),
                     "importance": importance,
                     "type": mem_type
                 }
-                
-                # Rebuild FAISS index from the updated JSON array
-                # (Since we can't delete directly from FlatL2 easily, we rebuild. Fast for personal DBs)
-                new_index = faiss.IndexFlatL2(self.dimension)
-                corpus_embeddings = self.model.encode([m["text"] for m in db["data"]], convert_to_numpy=True)
-                new_index.add(corpus_embeddings)
-                db["index"] = new_index
-                
-                self._save_domain(domain_name)
+
+                # In-place vector swap: remove the stale id, re-insert the new
+                # embedding under the same id. No re-encode of the whole domain.
+                ids = np.array([match_idx], dtype='int64')
+                db["index"].remove_ids(ids)
+                db["index"].add_with_ids(embedding, ids)
+
+                # Keep the SoA arrays in sync with the overwritten slot
+                db["timestamps"][match_idx]  = db["data"][match_idx]["timestamp"]
+                db["importances"][match_idx] = importance
+                db["has_decay"][match_idx]   = True
+
+                # Overwrites are rare — checkpoint so no stale WAL record
+                # for this id can shadow the update on replay
+                self._checkpoint(domain_name)
                 return
-        
-        # 3. Add to FAISS and local list normally if no close duplicate exists
+
+        # 3. Add to FAISS and local dict normally if no close duplicate exists
         memory_obj = {
             "text": text,
             "timestamp": time.time(),
             "importance": importance,
             "type": mem_type
         }
-        
-        db["index"].add(embedding)
-        db["data"].append(memory_obj)
-        
-        # 4. Save persistently
-        self._save_domain(domain_name)
+
+        new_id = db["next_id"]
+        db["index"].add_with_ids(embedding, np.array([new_id], dtype='int64'))
+        db["data"][new_id] = memory_obj
+        db["text_to_idx"][text] = new_id
+        db["next_id"] = new_id + 1
+        db["timestamps"]  = np.append(db["timestamps"], memory_obj["timestamp"])
+        db["importances"] = np.append(db["importances"], np.float32(importance))
+        db["has_decay"]   = np.append(db["has_decay"], True)
+
+        # 4. Save persistently: append one WAL record (O(1)) instead of
+        # rewriting the whole index + meta; merge once the WAL grows
+        self._append_wal(domain_name, new_id, embedding, memory_obj)
+        if db["wal_len"] >= self.WAL_MERGE_THRESHOLD:
+            self._checkpoint(domain_name)
         print(f"💾 [Memory Saved] -> '{domain_name}': {text[:50]}...")
 
-    def search_with_decay(self, domain_name: str, query: str, top_k: int = 3) -> list:
+    def add_memories_batch(self, domain_name: str, texts: list, importances: list = None, mem_types: list = None):
+        """
+        Bulk ingestion path: one batched encoder forward and a single
+        add_with_ids, instead of per-text add_memory calls. Skips dedup —
+        intended for imports where the caller already knows the texts are new.
         """
-        Retrieves memories and applies the composite scoring formula:
+        if not texts:
+            return
+        if domain_name not in self.databases:
+            self._init_empty_domain(domain_name)
+
+        db = self.databases[domain_name]
+        importances = importances if importances is not None else [0.5] * len(texts)
+        mem_types = mem_types if mem_types is not None else ["general"] * len(texts)
+
+        embeddings = self.model.encode(
+            texts, batch_size=1024, convert_to_numpy=True,
+            show_progress_bar=False, normalize_embeddings=True,
+        ).astype(np.float32)
+
+        now = time.time()
+        start_id = db["next_id"]
+        ids = np.arange(start_id, start_id + len(texts), dtype='int64')
+        db["index"].add_with_ids(embeddings, ids)
+        for offset, (text, imp, mt) in enumerate(zip(texts, importances, mem_types)):
+            db["data"][start_id + offset] = {
+                "text": text,
+                "timestamp": now,
+                "importance": imp,
+                "type": mt,
+            }
+        db["next_id"] = start_id + len(texts)
+        self._rebuild_soa(db)
+
+        self._checkpoint(domain_name)
+        print(f"💾 [Memory Saved] -> '{domain_name}': {len(texts)} memories (batch)")
+
+    def search(self, domain_name: str, query: str, top_k: int = 3, query_vec=None,
+               apply_decay: bool = True) -> list:
+        """
+        Retrieves memories, applying the composite scoring formula:
         Score = Similarity + Importance_Weight + Recency_Weight
+        Pass a pre-computed `query_vec` (shape (1, d)) to skip re-encoding the
+        query; pass `apply_decay=False` to rank on raw similarity and skip the
+        decay math entirely (static dictionary domains).
         """
         if domain_name not in self.databases:
             return []
-            
+
         db = self.databases[domain_name]
         if db["index"].ntotal == 0:
             return []
-            
-        # 1. Fetch a wider net (e.g., top 10) so we can sort them manually by decay
-        fetch_k = min(10, db["index"].ntotal)
-        query_emb = self.model.encode([query], convert_to_numpy=True)
-        
-        # FAISS returns L2 distances (lower is better, 0 is exact match)
-        distances, indices = db["index"].search(query_emb, fetch_k)
-        
-        scored_results = []
-        current_time = time.time()
-        
-        for i, idx in enumerate(indices[0]):
-            if idx == -1: continue
-            
-            memory_obj = db["data"][idx]
-            
-            # Convert FAISS L2 distance to a "Similarity Score" (0 to 1, higher is better)
-            # L2 dist can technically be anything, but we invert it.
-            base_similarity = 1.0 / (1.0 + distances[0][i])
-            
-            # Enforce a strict minimum semantic relevance threshold so we don't return random memories.
-            # 0.40 score ~ 1.5 L2 distance. Irrelevant hits usually sit below 0.35.
-            if base_similarity < 0.40:
-                continue
-            
-            # Static items (like slang dictionary) don't have timestamps
-            if "timestamp" not in memory_obj:
-                scored_results.append((base_similarity, memory_obj))
-                continue
-                
-            # --- DECAY MATH ---
-            age_in_seconds = current_time - memory_obj.get("timestamp", current_time)
-            age_in_days = age_in_seconds / 86400.0
-            
-            importance = memory_obj.get("importance", 0.5)
-            
+
+        if query_vec is not None:
+            query_emb = query_vec
+        else:
+            query_emb = self._get_query_embedding(query)
+
+        ntotal = int(db["index"].ntotal)
+        if ntotal < 16:
+            # Tiny domain (personal memories start empty and grow slowly):
+            # one NumPy matvec over the reconstructed unit vectors beats the
+            # FAISS dispatch overhead, and every memory is a candidate anyway
+            ids = np.fromiter(db["data"].keys(), dtype=np.int64, count=len(db["data"]))
+            vecs = np.stack([db["index"].reconstruct(int(i)) for i in ids])
+            idxs = ids
+            sims = (vecs @ query_emb[0]).astype(np.float64)
+        else:
+            # Fetch a wider net so we can re-rank by decay; past ~10 hits the
+            # extra candidates never survive the relevance cutoff
+            fetch_k = min(10, ntotal)
+            # Inner product over unit vectors: FAISS returns cosine similarity directly
+            distances, indices = db["index"].search(query_emb, fetch_k)
+            idxs = indices[0]
+            sims = distances[0].astype(np.float64)
+
+        # ── Vectorized decay scoring (no per-hit Python math) ──
+
+        # Drop padding hits and enforce a strict minimum semantic relevance
+        # threshold so we don't return random memories (irrelevant hits
+        # usually sit below 0.35 cosine).
+        keep = (idxs != -1) & (sims >= 0.40)
+        if not keep.any():
+            return []
+        idxs = idxs[keep]
+        sims = sims[keep]
+
+        if apply_decay:
+            current_time = time.time()
+            # SoA gathers — one C-level fancy-index per field, no per-hit
+            # dict.get (entries without timestamps, like slang dictionary
+            # rows, have has_decay False and score on similarity alone)
+            has_decay   = db["has_decay"][idxs]
+            timestamps  = np.where(has_decay, db["timestamps"][idxs], current_time)
+            importances = db["importances"][idxs].astype(np.float64)
+
             # Decay Formula: similarity * (1 / (1 + age_in_days))
-            recency_weight = base_similarity * (1.0 / (1.0 + age_in_days))
-            
-            # Final Score
-            final_score = base_similarity + (importance * 0.5) + recency_weight
-            
-            scored_results.append((final_score, memory_obj))
-            
-        # Sort by highest final score
-        scored_results.sort(key=lambda x: x[0], reverse=True)
-        
-        # Return only the top_k elements, stripping the score away
-        return [item[1] for item in scored_results[:top_k]]
+            age_in_days = (current_time - timestamps) / 86400.0
+            recency_weight = sims * (1.0 / (1.0 + age_in_days))
+            final_scores = np.where(has_decay, sims + importances * 0.5 + recency_weight, sims)
+        else:
+            final_scores = sims
 
-    def search(self, domain_name: str, query: str, top_k: int = 3) -> list:
-        """Standard search without decay routing to search_with_decay"""
-        return self.search_with_decay(domain_name, query, top_k)
+        # Top-k via argpartition (O(N)); only the winners get fully sorted
+        k = min(top_k, len(final_scores))
+        top = np.argpartition(-final_scores, k - 1)[:k]
+        top = top[np.argsort(-final_scores[top])]
+        # Only the k winners ever touch the Python-side dicts
+        return [db["data"][int(idxs[i])] for i in top]
 
     def format_search_results(self, matches: list) -> str:
         if not matches:
             return ""
         context = ""
         for item in matches:
-            # If it's a dynamic memory, just grab the 'text', else it's a dictionary record
+            # If it's a dynamic memory, just grab the 'text', else it's a dictionary
+            # record whose display string was pre-joined at index-build time
             if "text" in item:
                 context += f" - {item['text']}\n"
+            elif "_search_text" in item:
+                context += f" - {item['_search_text']}\n"
             else:
                 context += " - " + ", ".join([f"**{k}**: {v}" for k, v in item.items()]) + "\n"
         return context
@@ -11,38 +11,51 @@ import re
 # Suppress warnings
 warnings.filterwarnings("ignore", category=UserWarning, module="langchain_core")
 
-from core.llm_client import LLMClient
-from memory.quote_db import QuoteDBManager
-from memory.vector_db import VectorDBManager
-from memory.short_term import ConversationBuffer
-from agents.cinematic_pipeline import CinematicPipeline
-from agents.memory_gatekeeper import MemoryGatekeeper
-from core.tts_engine import get_tts_engine
-
 
 # ─────────────────────────────────────────────────────────────
 # Helper Functions
 # ─────────────────────────────────────────────────────────────
+# Sanitizer patterns compiled once at import — skips the re-module cache
+# lookup (and char-class re-parse) on every assistant response
+_RE_TRAILING_PAREN = re.compile(r'\s*\([^)]+\)\s*\.?\s*$')
+_RE_BRACKETS       = re.compile(r'\[.*?\]|\(.*?\)')
+_RE_MARKDOWN       = re.compile(r'[*_~]')
+_RE_NOISE          = re.compile(r'[^\w\s.,!?:;\'"—“”‘’\-]')
+_RE_WHITESPACE     = re.compile(r'\s+')
+
+
+def drive_stream(agen, loop):
+    """
+    Bridges the pipeline's async generator onto the persistent event loop so
+    st.write_stream (a sync consumer) renders chunks as the LLM decodes them.
+    """
+    while True:
+        try:
+            yield loop.run_until_complete(agen.__anext__())
+        except StopAsyncIteration:
+            break
+
+
 def sanitize_for_tts(text: str) -> str:
     """
     Remove attribution, symbols, emojis, and brackets from the response so the TTS
     engine reads it naturally without vocalizing punctuation or markdown.
     """
     # 1. Remove the explicit (Source) trailing at the end
-    text = re.sub(r'\s*\([^)]+\)\s*\.?\s*$', '', text)
-    
+    text = _RE_TRAILING_PAREN.sub('', text)
+
     # 2. Remove any other content inside brackets or parentheses
-    text = re.sub(r'\[.*?\]|\(.*?\)', '', text)
-    
+    text = _RE_BRACKETS.sub('', text)
+
     # 3. Remove asterisks, underscores, and tildes (markdown formatting)
-    text = re.sub(r'[*_~]', '', text)
-    
+    text = _RE_MARKDOWN.sub('', text)
+
     # 4. Remove emojis and visual noise (keep only alphanumeric and readable punctuation)
-    text = re.sub(r'[^\w\s.,!?:;\'"—“”‘’\-]', '', text)
-    
+    text = _RE_NOISE.sub('', text)
+
     # 5. Clean up duplicate spaces
-    text = re.sub(r'\s+', ' ', text).strip()
-    
+    text = _RE_WHITESPACE.sub(' ', text).strip()
+
     return text
 
 
@@ -52,10 +65,31 @@ def sanitize_for_tts(text: str) -> str:
 @st.cache_resource
 def init_pipeline():
     """Initialize the cinematic pipeline (cached to avoid reloading)."""
+    # Heavy imports live here, not at module top: Streamlit re-executes this
+    # module on every widget interaction, and only this function is cached.
+    # Keeps per-rerun import cost to streamlit/asyncio/re/warnings.
+    from core.llm_client import LLMClient
+    from memory.quote_db import QuoteDBManager
+    from memory.vector_db import VectorDBManager
+    from memory.short_term import ConversationBuffer
+    from agents.cinematic_pipeline import CinematicPipeline
+    from agents.memory_gatekeeper import MemoryGatekeeper
+
+    # One persistent event loop for the whole app: run_until_complete on a
+    # warm loop skips the per-turn loop setup/teardown of asyncio.run and
+    # keeps loop-bound resources (httpx keep-alive pool) alive across turns
+    loop = asyncio.new_event_loop()
+
+    # Warm the shared encoder off the critical path so the first real query
+    # doesn't pay MiniLM's cold-start cost
+    import threading
+    from core.shared_encoder import warmup
+    threading.Thread(target=warmup, daemon=True).start()
+
     llm = LLMClient()
     quote_db = QuoteDBManager(
         json_path="data/quote_dictionary.json",
-        index_path="data/indexes/quote.index",
+        index_path="data/indexes/quote_hnsw.index",
     )
     vector_db = VectorDBManager(
         data_dir="data",
@@ -71,7 +105,7 @@ def init_pipeline():
         chat_buffer=buffer,
         gatekeeper=gatekeeper,
     )
-    return pipeline, buffer
+    return pipeline, buffer, loop
 
 
 # ─────────────────────────────────────────────────────────────
@@ -179,9 +213,10 @@ def main():
     
     if "pipeline" not in st.session_state:
         with st.spinner("⏳ Loading cinematic pipeline..."):
-            pipeline, buffer = init_pipeline()
+            pipeline, buffer, loop = init_pipeline()
             st.session_state.pipeline = pipeline
             st.session_state.buffer = buffer
+            st.session_state.loop = loop
     
     # Sidebar controls
     with st.sidebar:
@@ -277,30 +312,28 @@ def main():
         
         st.session_state.messages.append({"role": "user", "content": user_input})
         
-        # Get bot response
+        # Get bot response — streamed, so the first tokens appear while the
+        # blend LLM is still decoding instead of after the full generation
         with st.chat_message("assistant", avatar="🎬"):
-            with st.spinner("🎭 Finding the perfect quote..."):
-                # Run async pipeline
-                response = asyncio.run(st.session_state.pipeline.run(user_input))
-                
-                # Display response with formatting
-                st.markdown(f'<div style="color: white;">{response}</div>', unsafe_allow_html=True)
-                
-                # Generate TTS if enabled
-                audio_file = None
-                if enable_tts:
-                    with st.spinner("🔊 Generating voice..."):
-                        try:
-                            tts_engine = get_tts_engine()
-                            # Remove attribution (character/source) and sanitize symbols before TTS
-                            tts_text = sanitize_for_tts(response)
-                            audio_file = tts_engine.generate_speech(tts_text)
-                            if audio_file:
-                                # Determine audio format
-                                audio_format = "audio/mp3" if audio_file.endswith('.mp3') else "audio/wav"
-                                st.audio(audio_file, format=audio_format)
-                        except Exception as e:
-                            st.error(f"⚠️ TTS error: {e}")
+            stream = st.session_state.pipeline.run_stream(user_input)
+            response = st.write_stream(drive_stream(stream, st.session_state.loop))
+
+            # Generate TTS if enabled
+            audio_file = None
+            if enable_tts:
+                with st.spinner("🔊 Generating voice..."):
+                    try:
+                        from core.tts_engine import get_tts_engine
+                        tts_engine = get_tts_engine()
+                        # Remove attribution (character/source) and sanitize symbols before TTS
+                        tts_text = sanitize_for_tts(response)
+                        audio_file = tts_engine.generate_speech(tts_text)
+                        if audio_file:
+                            # Determine audio format
+                            audio_format = "audio/mp3" if audio_file.endswith('.mp3') else "audio/wav"
+                            st.audio(audio_file, format=audio_format)
+                    except Exception as e:
+                        st.error(f"⚠️ TTS error: {e}")
         
         # Save assistant message
         st.session_state.messages.append({